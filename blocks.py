@@ -1,13 +1,69 @@
+# Integer codes for each block type, used by array-based beam simulation.
+EMPTY, REFLECT, OPAQUE, REFRACT = 0, 1, 2, 3
+
+# Shared result for interactions that stop the beam.
+_EMPTY = ()
+
+# Precomputed reflections, keyed by (beam is on a left/right face, dx, dy).
+# A left/right face flips dx, a top/bottom face flips dy.
+_REFLECT = {
+    (vertical_face, dx, dy): (-dx, dy) if vertical_face else (dx, -dy)
+    for vertical_face in (True, False)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+}
+
+
+def _interact_uncached(kind, has_refracted, vertical_face, dx, dy):
+    """
+    Compute a beam interaction; used once per case to fill INTERACTIONS.
+
+    Args:
+        kind (int): Block type code (EMPTY, REFLECT, OPAQUE or REFRACT).
+        has_refracted (bool): Whether a refract block has already split a beam.
+        vertical_face (bool): Whether the beam sits on a left/right face.
+        dx, dy (int): Incoming beam direction.
+
+    Returns:
+        tuple: (tuple of resulting beam directions, new has_refracted value).
+    """
+    if kind == REFLECT:
+        return (_REFLECT[(vertical_face, dx, dy)],), has_refracted
+    elif kind == OPAQUE:
+        return _EMPTY, has_refracted
+    elif kind == REFRACT and not has_refracted:
+        return ((dx, dy), _REFLECT[(vertical_face, dx, dy)]), True
+    return ((dx, dy),), has_refracted
+
+
+# Every beam interaction, keyed by (kind, has_refracted, beam is on a
+# left/right face, dx, dy). Results are shared tuples, so looking one up
+# allocates nothing.
+INTERACTIONS = {
+    (kind, has_refracted, vertical_face, dx, dy): _interact_uncached(
+        kind, has_refracted, vertical_face, dx, dy
+    )
+    for kind in (EMPTY, REFLECT, OPAQUE, REFRACT)
+    for has_refracted in (False, True)
+    for vertical_face in (True, False)
+    for dx in (-1, 0, 1)
+    for dy in (-1, 0, 1)
+}
+
+
 class Block:
     """
     Base class for all block types in the Lazor game.
 
     Attributes:
+        kind (int): Integer code of the block type (EMPTY for the base class).
         fixed (bool): Whether the block is fixed in place.
         top, left, bottom, right (int): Boundaries of the block on the board.
         orig_pos (tuple): Original (i, j) grid position of the block.
     """
 
+    kind = EMPTY
+
     def __init__(self, fixed=False):
         self.fixed = fixed
         self.top = None
@@ -48,6 +104,10 @@ class Block:
         """
         Reflect the beam based on the side it hit.
 
+        Block boundaries lie on even coordinates and beams move on integer
+        coordinates, so an even x means the beam sits on a left/right face;
+        otherwise it sits on a top/bottom face.
+
         Args:
             beam_position (tuple): Current position of the beam (x, y).
             beam_direction (tuple): Direction of the beam (dx, dy).
@@ -55,35 +115,31 @@ class Block:
         Returns:
             tuple: New direction after reflection.
         """
-        x, y = beam_position
         dx, dy = beam_direction
-
-        # Calculate distances to each side of the block.
-        dist_left = abs(x - self.left)
-        dist_right = abs(x - self.right)
-        dist_top = abs(y - self.top)
-        dist_bottom = abs(y - self.bottom)
-
-        dmin = min(dist_left, dist_right, dist_top, dist_bottom)
-
-        # Reflect off the nearest side.
-        if dmin == dist_left or dmin == dist_right:
-            return (-dx, dy)  # Flip x-direction (horizontal reflection)
-        else:
-            return (dx, -dy)  # Flip y-direction (vertical reflection)
+        return _REFLECT[(beam_position[0] % 2 == 0, dx, dy)]
 
     def interact(self, beam_direction, beam_position):
         """
         Default interaction with the beam: no effect.
 
+        Every block type returns the same shape, so callers can iterate the
+        result directly without checking it.
+
         Args:
             beam_direction (tuple): Incoming beam direction.
             beam_position (tuple): Beam's current position.
 
         Returns:
-            list: List of resulting beam directions (default: unchanged).
+            tuple: Tuple of resulting (dx, dy) beam directions, empty if the
+            beam stops (default: unchanged).
+        """
+        return (beam_direction,)
+
+    def reset(self):
         """
-        return [beam_direction]
+        Clear any state accumulated while simulating beams (default: none).
+        """
+        pass
 
 
 class ReflectBlock(Block):
@@ -91,9 +147,10 @@ class ReflectBlock(Block):
     Reflective block that bounces the beam off its surface.
     """
 
+    kind = REFLECT
+
     def interact(self, beam_direction, beam_position):
-        new_dir = self.reflect_beam(beam_position, beam_direction)
-        return [new_dir]
+        return (self.reflect_beam(beam_position, beam_direction),)
 
 
 class OpaqueBlock(Block):
@@ -101,8 +158,10 @@ class OpaqueBlock(Block):
     Opaque block that absorbs the beam, stopping it completely.
     """
 
+    kind = OPAQUE
+
     def interact(self, beam_direction, beam_position):
-        return []  # No beams continue.
+        return _EMPTY  # No beams continue.
 
 
 class RefractBlock(Block):
@@ -112,6 +171,8 @@ class RefractBlock(Block):
     only the continuing beam remains.
     """
 
+    kind = REFRACT
+
     def __init__(self, fixed=False):
         super().__init__(fixed)
         self.has_refracted = False
@@ -121,6 +182,9 @@ class RefractBlock(Block):
             self.has_refracted = True
             cont = beam_direction
             refl = self.reflect_beam(beam_position, beam_direction)
-            return [cont, refl]
+            return (cont, refl)
         else:
-            return [beam_direction]
+            return (beam_direction,)
+
+    def reset(self):
+        self.has_refracted = False
@@ -1,5 +1,47 @@
-from blocks import ReflectBlock, OpaqueBlock, RefractBlock
-import copy
+import numpy as np
+from blocks import ReflectBlock, OpaqueBlock, RefractBlock, EMPTY, REFLECT, OPAQUE, REFRACT
+from parser_bff import encode_grid
+
+
+def entered_cell(x, y, dx, dy):
+    """
+    Find the grid cell a beam enters when it moves on from point (x, y).
+
+    Beams travel along block edges, so an even coordinate means the beam sits
+    on a cell boundary along that axis and the direction decides which side
+    it crosses into.
+
+    Args:
+        x, y (int): Current beam position.
+        dx, dy (int): Beam direction.
+
+    Returns:
+        tuple: (i, j) row and column of the entered cell (may lie off the grid).
+    """
+    i = (y + dy) // 2 if y % 2 == 0 else y // 2
+    j = (x + dx) // 2 if x % 2 == 0 else x // 2
+    return i, j
+
+
+def _shallow_copy_block(block):
+    """
+    Create a fresh copy of a block with the same type, boundaries, and state.
+
+    Args:
+        block (Block): The block to copy.
+
+    Returns:
+        Block: A new block instance independent of the original.
+    """
+    new_block = type(block)(fixed=block.fixed)
+    new_block.top = block.top
+    new_block.left = block.left
+    new_block.bottom = block.bottom
+    new_block.right = block.right
+    new_block.orig_pos = block.orig_pos
+    if isinstance(block, RefractBlock):
+        new_block.has_refracted = block.has_refracted
+    return new_block
 
 
 class Board:
@@ -13,60 +55,138 @@ class Board:
 
         Args:
             data (dict): Dictionary with keys:
-                - "grid": 2D list of characters (e.g., "x", "o", "A", "B", "C").
+                - "grid": int8 array from parse_bff_file, or a 2D list or
+                  character array of "x", "o", "A", "B", "C".
                 - "blocks_available": dict of available blocks by type.
                 - "lasers": list of tuples (x, y, dx, dy) for initial lazor positions and directions.
-                - "points": list of target (x, y) coordinates to hit.
+                - "points": list of target (x, y) coordinates to hit, stored
+                  as a frozenset.
         """
-        self.orig_grid = data["grid"]
+        grid = data["grid"]
+        if not isinstance(grid, np.ndarray) or grid.dtype.kind in "US":
+            grid = encode_grid(grid)
+        self.orig_grid = grid
         self.blocks_available = data["blocks_available"]
         self.lasers = data["lasers"]
-        self.points = data["points"]
+        # Targets are only ever tested for membership, so keep them as a set.
+        self.points = frozenset(data["points"])
 
-        self.orig_height = len(self.orig_grid)
-        self.orig_width = len(self.orig_grid[0]) if self.orig_height > 0 else 0
+        self.orig_height, self.orig_width = self.orig_grid.shape
 
         # Fixed blocks on the board, determined from "A", "B", "C" in the grid.
+        # Every block, fixed or free, is also indexed by the grid cell it
+        # occupies, and its kind kept in a type grid for array-based consumers.
+        block_classes = {REFLECT: ReflectBlock, OPAQUE: OpaqueBlock, REFRACT: RefractBlock}
         self.fixed_blocks = []
-        for i in range(self.orig_height):
-            for j in range(self.orig_width):
-                cell = self.orig_grid[i][j]
-                if cell in ["A", "B", "C"]:
-                    top = 2 * i
-                    left = 2 * j
-                    bottom = top + 2
-                    right = left + 2
-
-                    # Instantiate the correct block type.
-                    if cell == "A":
-                        block = ReflectBlock(fixed=True)
-                    elif cell == "B":
-                        block = OpaqueBlock(fixed=True)
-                    elif cell == "C":
-                        block = RefractBlock(fixed=True)
-
-                    block.set_boundaries(top, left, bottom, right)
-                    block.orig_pos = (i, j)
-                    self.fixed_blocks.append(block)
+        self._block_grid = {}
+        self._type_grid = np.zeros((self.orig_height, self.orig_width), dtype=np.int8)
+        for i, j in np.argwhere(self.orig_grid > EMPTY).tolist():
+            block = block_classes[self.orig_grid[i, j]](fixed=True)
+            block.set_boundaries(2 * i, 2 * j, 2 * i + 2, 2 * j + 2)
+            block.orig_pos = (i, j)
+            self.fixed_blocks.append(block)
+            self._block_grid[(i, j)] = block
+            self._type_grid[i, j] = block.kind
 
         # Free positions are all grid cells that are not marked as "x", "A", "B", or "C".
-        self.free_positions = []
-        for i in range(self.orig_height):
-            for j in range(self.orig_width):
-                if self.orig_grid[i][j] not in ["x", "A", "B", "C"]:
-                    self.free_positions.append((i, j))
+        self.free_positions = [
+            (i, j) for i, j in np.argwhere(self.orig_grid == EMPTY).tolist()
+        ]
+
+        # Cells a lazor crosses when traced straight through an empty board,
+        # and the same positions, most promising first, for the solver to try.
+        self.laser_crossings = self._trace_laser_crossings()
+        self.free_positions_ordered = self._order_free_positions()
 
-        # Tracks free blocks that are dynamically placed during solving.
+        # Tracks free blocks that are dynamically placed during solving,
+        # both in placement order and indexed by grid cell.
         self.free_blocks_placed = []
+        self._placed_by_pos = {}
+        # Combined list returned by get_placed_blocks, rebuilt after the
+        # free blocks change.
+        self._all_blocks = None
+
+        # Cells that can currently take a free block: open cells with no block yet.
+        self._open_cells = frozenset(self.free_positions)
+        self._placeable_cells = set(self._open_cells)
+
+    def _trace_laser_crossings(self):
+        """
+        Count how many lazors cross each grid cell when traced straight
+        through the board, ignoring all blocks.
+
+        Returns:
+            numpy.ndarray: int array of shape (height, width) with the number
+            of lazor crossings per cell.
+        """
+        crossings = np.zeros((self.orig_height, self.orig_width), dtype=np.int32)
+        for x, y, dx, dy in self.lasers:
+            while 0 <= x <= 2 * self.orig_width and 0 <= y <= 2 * self.orig_height:
+                i, j = entered_cell(x, y, dx, dy)
+                if 0 <= i < self.orig_height and 0 <= j < self.orig_width:
+                    crossings[i, j] += 1
+                x += dx
+                y += dy
+        return crossings
+
+    def _order_free_positions(self):
+        """
+        Order free positions so that cells most likely to matter come first.
+
+        Cells crossed by more lazors (see laser_crossings) come first; ties go
+        to cells closer to a target point.
+
+        Returns:
+            list: Free positions (i, j) sorted by the heuristic.
+        """
+        def target_distance(position):
+            i, j = position
+            return min(
+                (abs(2 * j + 1 - px) + abs(2 * i + 1 - py) for px, py in self.points),
+                default=0,
+            )
+
+        return sorted(
+            self.free_positions,
+            key=lambda position: (-self.laser_crossings[position], target_distance(position)),
+        )
 
     def get_placed_blocks(self):
         """
         Return a combined list of all currently placed blocks.
 
+        The list is cached until a free block is placed or removed, so callers
+        must not modify it.
+
         Returns:
             list: All blocks, both fixed and free.
         """
-        return self.fixed_blocks + self.free_blocks_placed
+        if self._all_blocks is None:
+            self._all_blocks = self.fixed_blocks + self.free_blocks_placed
+        return self._all_blocks
+
+    def block_at_cell(self, i, j):
+        """
+        Return the block occupying grid cell (i, j), if any.
+
+        Args:
+            i (int): Row index in the grid.
+            j (int): Column index in the grid.
+
+        Returns:
+            Block or None: The fixed or free block at (i, j), or None if the cell is empty.
+        """
+        return self._block_grid.get((i, j))
+
+    def to_typegrid(self):
+        """
+        Encode the current block layout as an integer array of block type codes.
+
+        Returns:
+            numpy.ndarray: int8 array of shape (height, width) holding the block
+            kind (see blocks.EMPTY/REFLECT/OPAQUE/REFRACT) at each grid cell.
+        """
+        return self._type_grid.copy()
 
     def is_placeable(self, i, j):
         """
@@ -79,13 +199,8 @@ class Board:
         Returns:
             bool: True if the position is valid for placing a free block.
         """
-        # Cannot place on invalid cell or where a block is already placed.
-        if self.orig_grid[i][j] == "x":
-            return False
-        for block in self.free_blocks_placed:
-            if block.orig_pos == (i, j):
-                return False
-        return True
+        # Cannot place on invalid or fixed-block cells, or where a block is already placed.
+        return (i, j) in self._placeable_cells
 
     def place_free_block(self, i, j, block):
         """
@@ -103,6 +218,11 @@ class Board:
         block.set_boundaries(top, left, bottom, right)
         block.orig_pos = (i, j)
         self.free_blocks_placed.append(block)
+        self._placed_by_pos[(i, j)] = block
+        self._all_blocks = None
+        self._placeable_cells.discard((i, j))
+        self._block_grid[(i, j)] = block
+        self._type_grid[i, j] = block.kind
 
     def remove_free_block(self, i, j):
         """
@@ -112,16 +232,100 @@ class Board:
             i (int): Row index in the grid.
             j (int): Column index in the grid.
         """
-        for idx, block in enumerate(self.free_blocks_placed):
-            if block.orig_pos == (i, j):
-                del self.free_blocks_placed[idx]
-                return
+        block = self._placed_by_pos.pop((i, j), None)
+        if block is not None:
+            self.free_blocks_placed.remove(block)
+            self._all_blocks = None
+            if (i, j) in self._open_cells:
+                self._placeable_cells.add((i, j))
+            del self._block_grid[(i, j)]
+            self._type_grid[i, j] = EMPTY
+
+    def remove_last_free_block(self):
+        """
+        Remove the most recently placed free block.
+
+        This is the undo step of the solver's backtracking search and runs
+        in constant time.
+        """
+        block = self.free_blocks_placed.pop()
+        del self._placed_by_pos[block.orig_pos]
+        self._all_blocks = None
+        if block.orig_pos in self._open_cells:
+            self._placeable_cells.add(block.orig_pos)
+        del self._block_grid[block.orig_pos]
+        self._type_grid[block.orig_pos] = EMPTY
+
+    def reset_blocks(self):
+        """
+        Reset the per-simulation state of every placed block, so that a new
+        beam simulation can run on this board without cloning it first.
+        """
+        for block in self.get_placed_blocks():
+            block.reset()
+
+    def snapshot_block_state(self):
+        """
+        Record the per-simulation state of every placed block.
+
+        Only refract blocks change while beams are traced, so this is much
+        cheaper than cloning the board around a simulation.
+
+        Returns:
+            list: (block, has_refracted) pairs for every refract block.
+        """
+        return [
+            (block, block.has_refracted)
+            for block in self.get_placed_blocks()
+            if isinstance(block, RefractBlock)
+        ]
+
+    def restore_block_state(self, snapshot):
+        """
+        Restore block state recorded by snapshot_block_state.
+
+        Args:
+            snapshot (list): Value returned by snapshot_block_state.
+        """
+        for block, has_refracted in snapshot:
+            block.has_refracted = has_refracted
 
     def clone(self):
         """
-        Create a deep copy of the board, useful for exploring new configurations during solving.
+        Create a copy of the board, useful for exploring new configurations during solving.
+
+        Read-only data (grid, lasers, points, free positions) is shared with the
+        original; only the state that can change while solving is copied.
 
         Returns:
             Board: A new, independent copy of this board instance.
         """
-        return copy.deepcopy(self)
+        new = Board.__new__(Board)
+        new.orig_grid = self.orig_grid
+        new.blocks_available = self.blocks_available.copy()
+        new.lasers = self.lasers
+        new.points = self.points
+        new.orig_height = self.orig_height
+        new.orig_width = self.orig_width
+        new.free_positions = self.free_positions
+        new.laser_crossings = self.laser_crossings
+        new.free_positions_ordered = self.free_positions_ordered
+
+        # Fixed blocks are shared, except refract blocks whose state changes
+        # while beams are simulated.
+        new.fixed_blocks = [
+            _shallow_copy_block(block) if isinstance(block, RefractBlock) else block
+            for block in self.fixed_blocks
+        ]
+        new.free_blocks_placed = [
+            _shallow_copy_block(block) for block in self.free_blocks_placed
+        ]
+        new._placed_by_pos = {block.orig_pos: block for block in new.free_blocks_placed}
+        new._all_blocks = None
+        new._open_cells = self._open_cells
+        new._placeable_cells = self._placeable_cells.copy()
+        new._block_grid = {
+            block.orig_pos: block for block in new.get_placed_blocks()
+        }
+        new._type_grid = self._type_grid.copy()
+        return new
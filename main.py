@@ -4,102 +4,172 @@ main.py
 Entry point for running the Lazor puzzle solver.
 
 Usage:
-    python main.py <path_to_bff_file>
+    python main.py <path_to_bff_file> [--verbose] [--no-image] [--out-dir DIR]
+                                    [--jobs N] [--timestamp]
 
 This script:
   - Parses the .bff puzzle file.
-  - Initializes logging.
+  - Initializes logging (debug logs only with --verbose).
   - Solves the board using a backtracking search.
   - Outputs the solution as a visual and text file if successful.
 """
 
-import sys
+import argparse
 import os
 import datetime
 import logging
 import time
 from parser_bff import parse_bff_file
 from board import Board
-from solver import solve
+from solver import solve, solve_parallel
 from visualization import visualize_board
 from visualization_image import save_laser_image
 
 
-def main():
+def _parse_args(argv=None):
     """
-    Main function to run the Lazor solver. Handles:
-        - Parsing .bff input
-        - Logging setup
-        - Board initialization
-        - Backtracking solver execution
-        - Outputting solution files and visualizations
+    Parse the command-line arguments.
+
+    Args:
+        argv (list of str): Arguments to parse; defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: Parsed options.
     """
-    # Ensure a .bff file is passed as an argument.
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <bff_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Solve a Lazor puzzle from a .bff file.")
+    parser.add_argument("bff_file", help="path to the .bff puzzle file")
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="write step-by-step debug logs to the logs folder (much slower)",
+    )
+    parser.add_argument(
+        "--no-image", action="store_true", help="skip rendering the solution image"
+    )
+    parser.add_argument(
+        "--out-dir", default="output", help="folder for solution files (default: output)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes to search with (default: 1, no workers)",
+    )
+    parser.add_argument(
+        "--timestamp",
+        action="store_true",
+        help="add the run's timestamp to solution file names",
+    )
+    return parser.parse_args(argv)
 
-    bff_file = sys.argv[1]
-    data = parse_bff_file(bff_file)
 
-    # Create log and output directories if missing
-    os.makedirs("logs", exist_ok=True)
-    os.makedirs("output", exist_ok=True)
+def _setup_logging(bff_name, timestamp, verbose):
+    """
+    Configure the root logger and, when verbose, the visual board logger.
 
-    bff_basename = os.path.basename(bff_file)
-    bff_name, _ = os.path.splitext(bff_basename)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    Debug output is expensive in the solver's hot loop, so it is only enabled
+    on request. Handlers are only installed once per process.
 
-    # Setup logging
-    log_filename = f"logs/solver_debug_{bff_name}_{timestamp}.log"
-    logging.basicConfig(
-        filename=log_filename,
-        level=logging.DEBUG,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-    )
-    logging.info("Started solver for file: %s", bff_file)
+    Args:
+        bff_name (str): Puzzle name used in the log file names.
+        timestamp (str): Run timestamp used in the log file names.
+        verbose (bool): Whether to log debug output.
+    """
+    os.makedirs("logs", exist_ok=True)
+
+    root_logger = logging.getLogger()
+    if not root_logger.handlers:
+        log_filename = f"logs/solver_debug_{bff_name}_{timestamp}.log"
+        logging.basicConfig(
+            filename=log_filename,
+            level=logging.DEBUG if verbose else logging.WARNING,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+        )
 
     # Visual logger (separate for board visual steps)
-    visual_log_filename = f"logs/solver_visual_{bff_name}_{timestamp}.log"
     visual_logger = logging.getLogger("visual")
-    visual_logger.propagate = False
-    visual_logger.setLevel(logging.DEBUG)
-    visual_handler = logging.FileHandler(visual_log_filename)
-    visual_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
-    visual_logger.addHandler(visual_handler)
-    logging.info("Visual logger initialized with file: %s",
-                 visual_log_filename)
+    if verbose and not visual_logger.handlers:
+        visual_log_filename = f"logs/solver_visual_{bff_name}_{timestamp}.log"
+        visual_logger.propagate = False
+        visual_logger.setLevel(logging.DEBUG)
+        visual_handler = logging.FileHandler(visual_log_filename)
+        visual_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        visual_logger.addHandler(visual_handler)
+        logging.info("Visual logger initialized with file: %s", visual_log_filename)
 
     # Reduce clutter from matplotlib font warnings
     logging.getLogger("matplotlib.font_manager").setLevel(logging.WARNING)
 
+
+def _write_outputs(board, solution, bff_name, out_dir, write_image=True):
+    """
+    Print the solved board and save the solution text, board drawing, and image.
+
+    Args:
+        board (Board): The solved board.
+        solution (list): List of (position, block_type_name) tuples.
+        bff_name (str): Base name for the output files.
+        out_dir (str): Folder to write the output files to.
+        write_image (bool): Whether to render the lazor path image.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Save text representation of the solution
+    with open(os.path.join(out_dir, f"solution_{bff_name}.txt"), "w") as f:
+        f.write(str(solution))
+
+    # Generate and print visual text-based board
+    visual = visualize_board(board)
+    print(visual)
+    with open(os.path.join(out_dir, f"solution_visual_{bff_name}.txt"), "w") as f:
+        f.write(visual)
+
+    # Save laser path visualization image
+    if write_image:
+        image_filename = os.path.join(out_dir, f"solution_visual_{bff_name}.png")
+        save_laser_image(board, solution, image_filename)
+        print(f"Solution saved to {image_filename}")
+
+
+def main(argv=None):
+    """
+    Main function to run the Lazor solver. Handles:
+        - Parsing command-line options and .bff input
+        - Logging setup
+        - Board initialization
+        - Backtracking solver execution
+        - Outputting solution files and visualizations
+
+    Args:
+        argv (list of str): Command-line arguments; defaults to sys.argv[1:].
+    """
+    args = _parse_args(argv)
+    data = parse_bff_file(args.bff_file)
+
+    bff_basename = os.path.basename(args.bff_file)
+    bff_name, _ = os.path.splitext(bff_basename)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    _setup_logging(bff_name, timestamp, args.verbose)
+    logging.info("Started solver for file: %s", args.bff_file)
+
     # Initialize the board
     board = Board(data)
 
     # Solve the puzzle
     start_time = time.perf_counter()
-    solution = solve(board)
+    if args.jobs > 1:
+        solution = solve_parallel(board, args.jobs)
+    else:
+        solution = solve(board)
     elapsed_time = time.perf_counter() - start_time
     logging.info("Solver finished in %.4f seconds", elapsed_time)
 
     # Output solution if found
     if solution is not None:
         print("Solution found!")
-
-        # Save text representation of the solution
-        with open(f"output/solution_{bff_name}.txt", "w") as f:
-            f.write(str(solution))
-
-        # Generate and print visual text-based board
-        visual = visualize_board(board)
-        print(visual)
-        with open(f"output/solution_visual_{bff_name}.txt", "w") as f:
-            f.write(visual)
-
-        # Save laser path visualization image
-        image_filename = f"output/solution_visual_{bff_name}.png"
-        save_laser_image(board, solution, image_filename)
-        print(f"Solution saved to {image_filename}")
+        output_name = f"{bff_name}_{timestamp}" if args.timestamp else bff_name
+        _write_outputs(board, solution, output_name, args.out_dir, not args.no_image)
     else:
         print("No solution found.")
 
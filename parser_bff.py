@@ -1,68 +1,128 @@
+import functools
+import os
+import re
+import numpy as np
+from blocks import EMPTY, REFLECT, OPAQUE, REFRACT
+
+# Lines opening and closing the grid section, in any case.
+_GRID_MARKER = re.compile(r'GRID\s+(START|STOP)', re.IGNORECASE)
+
+# Integer code for grid cells where no block may be placed ("x").
+BLOCKED = -1
+
+# Integer code of each grid character; any other character is an open cell.
+GRID_CODES = {"x": BLOCKED, "o": EMPTY, "A": REFLECT, "B": OPAQUE, "C": REFRACT}
+
+
+def encode_grid(rows):
+    """
+    Convert grid rows of characters into an integer array.
+
+    Args:
+        rows (list of list of str or numpy.ndarray): Grid layout with elements
+            like 'o', 'x', 'A', 'B', 'C'.
+
+    Returns:
+        numpy.ndarray: int8 array of shape (height, width) using GRID_CODES.
+    """
+    if len(rows) == 0:
+        return np.zeros((0, 0), dtype=np.int8)
+    if isinstance(rows, np.ndarray) and rows.dtype.kind == "S":
+        rows = rows.astype("U")
+    return np.array(
+        [[GRID_CODES.get(cell, EMPTY) for cell in row] for row in rows], dtype=np.int8
+    )
+
+
 def parse_bff_file(filename):
     """
     Parse a .bff file and extract the game setup.
 
+    Files are only read and parsed again when they change; otherwise a copy
+    of the earlier result is returned, so callers may modify it freely.
+
     Args:
         filename (str): Path to the .bff file.
 
     Returns:
         dict: A dictionary containing:
-            - grid (list of list of str): 2D grid layout with elements like 'o', 'x', 'A', 'B', 'C'
+            - grid (numpy.ndarray): int8 grid layout encoded with GRID_CODES
+              ('x' -> BLOCKED, 'o' -> EMPTY, 'A'/'B'/'C' -> REFLECT/OPAQUE/REFRACT)
             - blocks_available (dict): Available free blocks, keys are 'A', 'B', 'C', values are int counts
             - lasers (list of tuples): List of lasers, each as (x, y, dx, dy)
             - points (list of tuples): Target points, each as (x, y)
     """
+    path = os.path.abspath(filename)
+    data = _parse_bff_cached(path, os.path.getmtime(path))
+    return {
+        'grid': data['grid'].copy(),
+        'blocks_available': dict(data['blocks_available']),
+        'lasers': list(data['lasers']),
+        'points': list(data['points'])
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_bff_cached(path, mtime):
+    """
+    Parse a .bff file, remembering the result for each (path, mtime) pair.
+
+    The modification time is not used for parsing; it is part of the cache
+    key so that an edited file is parsed again. The returned dict is shared,
+    so parse_bff_file hands out copies of it.
+
+    Args:
+        path (str): Absolute path to the .bff file.
+        mtime (float): Modification time of the file.
+
+    Returns:
+        dict: See parse_bff_file.
+    """
     grid = []
     blocks_available = {'A': 0, 'B': 0, 'C': 0}
     lasers = []
     points = []
 
-    # Read and clean lines (ignore comments and blank lines)
-    with open(filename, 'r') as f:
-        lines = [
-            line.strip()
-            for line in f
-            if not line.strip().startswith('#') and line.strip() != ''
-        ]
-
     reading_grid = False  # Flag for when we're reading grid rows
 
-    for line in lines:
-        # Start and stop of grid section
-        if line.upper().startswith("GRID START"):
-            reading_grid = True
-            continue
-        if line.upper().startswith("GRID STOP"):
-            reading_grid = False
-            continue
-
-        # Reading the grid layout
-        if reading_grid:
-            row = line.split()  # e.g., ['o', 'o', 'o', 'A']
-            grid.append(row)
-            continue
-
-        # Parse block counts, lasers, and target points
-        parts = line.split()
-
-        # Free block declaration, e.g., "A 2"
-        if parts[0] in ['A', 'B', 'C'] and len(parts) == 2:
-            block_type = parts[0]
-            count = int(parts[1])
-            blocks_available[block_type] = count
-
-        # Laser line, e.g., "L 2 7 1 -1"
-        elif parts[0] == 'L' and len(parts) == 5:
-            x, y, vx, vy = map(int, parts[1:])
-            lasers.append((x, y, vx, vy))
-
-        # Point line, e.g., "P 3 0"
-        elif parts[0] == 'P' and len(parts) == 3:
-            x, y = map(int, parts[1:])
-            points.append((x, y))
+    # Single pass over the file, skipping comments and blank lines.
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+
+            # Start and stop of grid section
+            marker = _GRID_MARKER.match(line)
+            if marker:
+                reading_grid = marker.group(1).upper() == 'START'
+                continue
+
+            # Reading the grid layout
+            if reading_grid:
+                grid.append(line.split())  # e.g., ['o', 'o', 'o', 'A']
+                continue
+
+            # Parse block counts, lasers, and target points
+            parts = line.split()
+            kind = parts[0]
+
+            # Free block declaration, e.g., "A 2"
+            if kind in blocks_available and len(parts) == 2:
+                blocks_available[kind] = int(parts[1])
+
+            # Laser line, e.g., "L 2 7 1 -1"
+            elif kind == 'L' and len(parts) == 5:
+                x, y, vx, vy = map(int, parts[1:])
+                lasers.append((x, y, vx, vy))
+
+            # Point line, e.g., "P 3 0"
+            elif kind == 'P' and len(parts) == 3:
+                x, y = map(int, parts[1:])
+                points.append((x, y))
 
     return {
-        'grid': grid,
+        'grid': encode_grid(grid),
         'blocks_available': blocks_available,
         'lasers': lasers,
         'points': points
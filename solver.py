@@ -1,8 +1,23 @@
 # solver.py
 
 import logging
-from blocks import ReflectBlock, OpaqueBlock, RefractBlock
+import multiprocessing
+from collections import OrderedDict, deque
+import numpy as np
+from blocks import ReflectBlock, OpaqueBlock, RefractBlock, EMPTY, REFRACT, INTERACTIONS
+from board import entered_cell
 from visualization import visualize_board
+from solver_numba import NUMBA_AVAILABLE, HIT, MISSED, simulate, trace
+
+# Limit beam length to prevent infinite loops
+MAX_STEPS = 200
+
+# Maximum number of configurations remembered by simulate_cached.
+SIM_CACHE_SIZE = 100_000
+
+# Results of compiled simulations, keyed by the encoded board, lazors, and
+# targets, in least-recently-used order.
+_sim_cache = OrderedDict()
 
 
 def log_board_state(board, message="Current board state"):
@@ -13,11 +28,81 @@ def log_board_state(board, message="Current board state"):
         board (Board): The Lazor game board instance.
         message (str): An optional message to prefix the board state.
     """
-    state = visualize_board(board)
-    logging.debug("%s:\n%s", message, state)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        state = visualize_board(board)
+        logging.debug("%s:\n%s", message, state)
+
+
+def _new_block(block_type):
+    """
+    Create a free block from its .bff letter.
+
+    Args:
+        block_type (str): "A" (reflect), "B" (opaque), or "C" (refract).
+
+    Returns:
+        Block: A new block instance of the matching type.
+    """
+    if block_type == "A":
+        return ReflectBlock()
+    elif block_type == "B":
+        return OpaqueBlock()
+    elif block_type == "C":
+        return RefractBlock()
+
+
+def targets_reachable(board):
+    """
+    Check whether every target could be hit by some layout of free blocks.
+
+    Beams are followed through an over-approximation of the board: at every
+    free cell a beam may both continue straight and reflect, whatever block
+    ends up there, while fixed blocks act as they always do (a fixed refract
+    block both continues and reflects). Every beam of every real layout is
+    among the beams found, so a target missed here can never be hit.
+
+    Args:
+        board (Board): The initialized board.
 
+    Returns:
+        bool: False if some target is unreachable in every layout, True otherwise.
+    """
+    size_x = board.orig_width * 2 + 1
+    size_y = board.orig_height * 2 + 1
+    open_cells = set(board.free_positions)
+    remaining = set(board.points)
+
+    seen_states = set()
+    stack = [tuple(laser) for laser in board.lasers]
+    while stack and remaining:
+        state = stack.pop()
+        if state in seen_states:
+            continue
+        seen_states.add(state)
+        x, y, dx, dy = state
 
-def solve(board):
+        cell = entered_cell(x, y, dx, dy)
+        if cell in open_cells:
+            kinds = (EMPTY, REFRACT)  # continue straight and reflect
+        else:
+            block = board.block_at_cell(*cell)
+            kinds = (block.kind if block is not None else EMPTY,)
+
+        for kind in kinds:
+            new_directions, _ = INTERACTIONS[(kind, False, x % 2 == 0, dx, dy)]
+            for new_dx, new_dy in new_directions:
+                if (new_dx, new_dy) != (dx, dy):
+                    stack.append((x, y, new_dx, new_dy))
+                    continue
+                next_x = x + dx
+                next_y = y + dy
+                if 0 <= next_x < size_x and 0 <= next_y < size_y:
+                    remaining.discard((next_x, next_y))
+                    stack.append((next_x, next_y, dx, dy))
+    return not remaining
+
+
+def solve(board, decisions=()):
     """
     Attempt to solve the Lazor game board using recursive backtracking.
 
@@ -25,8 +110,18 @@ def solve(board):
     free positions until a configuration is found such that all targets are hit
     by lazors.
 
+    Each step traces the lazors over the blocks decided so far (see
+    solver_numba.trace). If they miss a target without reaching an undecided
+    cell, no completion can succeed and the branch is abandoned. Otherwise the
+    search decides the first undecided cell a beam reaches, since that is the
+    cell the outcome currently depends on: each available block type is tried
+    there, then leaving it empty. Once the targets are hit, the remaining blocks
+    go to the undecided cells in the board's heuristic order (free_positions_ordered).
+
     Args:
         board (Board): The initialized board containing grid, lasers, targets, and block constraints.
+        decisions (sequence): Optional ((i, j), block_type or None) pairs fixing
+            the contents of some free cells before searching (see solve_parallel).
 
     Returns:
         list of tuple or None:
@@ -34,7 +129,11 @@ def solve(board):
                 (position (i, j), block class name as string).
             If no solution is found, returns None.
     """
-    targets = set(board.points)
+    targets = board.points
+
+    # Preflight: give up at once if some target cannot be hit by any layout.
+    if not targets_reachable(board):
+        return None
 
     # Use a counts dictionary for free blocks available by type.
     free_blocks_counts = {
@@ -43,64 +142,255 @@ def solve(board):
         "C": board.blocks_available.get("C", 0),
     }
 
-    positions = board.free_positions
+    positions = board.free_positions_ordered
 
-    def backtrack(pos_index, free_counts):
+    # Block layout and undecided cells mirrored as arrays for trace.
+    type_grid = board.to_typegrid()
+    undecided = np.zeros(type_grid.shape, dtype=np.bool_)
+    for i, j in positions:
+        undecided[i, j] = True
+    undecided_count = len(positions)
+    lasers = np.array(board.lasers, dtype=np.int64).reshape(-1, 4)
+    target_array = np.array(sorted(targets), dtype=np.int64).reshape(-1, 2)
+
+    # Complete layouts are checked directly, by the compiled simulation on these
+    # arrays or else by the Python tracer, unless debug logging asks for
+    # test_solution's step-by-step trace.
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    use_compiled = NUMBA_AVAILABLE and not debug
+
+    # Refract blocks add beams that quickly reveal contradictions, while opaque
+    # blocks can only remove options, so they are tried last.
+    block_types = ["C", "A", "B"]
+
+    def backtrack(free_counts):
         """
         Recursive helper function to try placing blocks and solving the puzzle.
 
+        Cells left empty are decided in a loop; only placing a block recurses,
+        so the recursion depth is the number of blocks placed.
+
         Args:
-            pos_index (int): The current index in the list of candidate positions.
             free_counts (dict): Remaining counts of each block type.
 
         Returns:
             list of tuple or None: A valid solution or None if backtracking fails.
         """
+        nonlocal undecided_count
+
         # Base case: no free blocks left to place
         if all(count == 0 for count in free_counts.values()):
-            if test_solution(board, targets):
+            # Uncached: a search never checks the same layout twice.
+            if use_compiled:
+                solved = simulate(type_grid, lasers, target_array, MAX_STEPS)
+            elif debug:
+                solved = test_solution(board, targets)
+            else:
+                solved = _trace_beams(board, targets)
+            if solved:
                 return [
                     (block.orig_pos, type(block).__name__)
                     for block in board.free_blocks_placed
                 ]
             return None
 
-        # Base case: all positions exhausted
-        if pos_index >= len(positions):
-            return None
+        blocks_left = sum(free_counts.values())
+        decided = []
+        while blocks_left <= undecided_count:
+            outcome, i, j = trace(type_grid, undecided, lasers, target_array, MAX_STEPS)
+            # Prune: the decided blocks already make some target unreachable.
+            if outcome == MISSED:
+                break
+            # Targets are all hit whatever fills the rest, so take any free cell.
+            if outcome == HIT:
+                i, j = next(
+                    position for position in positions if undecided[position]
+                )
+
+            undecided[i, j] = False
+            undecided_count -= 1
+            decided.append((i, j))
+
+            # Try placing each block type here; going round the loop again
+            # leaves this cell empty.
+            if board.is_placeable(i, j):
+                for block_type in block_types:
+                    if free_counts.get(block_type, 0) > 0:
+                        block = _new_block(block_type)
+                        board.place_free_block(i, j, block)
+                        type_grid[i, j] = block.kind
+                        free_counts[block_type] -= 1
+
+                        result = backtrack(free_counts)
+                        if result is not None:
+                            return result
+
+                        # Undo the move (backtrack)
+                        board.remove_last_free_block()
+                        type_grid[i, j] = EMPTY
+                        free_counts[block_type] += 1
+
+        # Cells left empty here are undecided again for the caller's next option.
+        for i, j in decided:
+            undecided[i, j] = True
+        undecided_count += len(decided)
+        return None
+
+    placed = 0
+    for (i, j), block_type in decisions:
+        undecided[i, j] = False
+        undecided_count -= 1
+        if block_type is not None:
+            block = _new_block(block_type)
+            board.place_free_block(i, j, block)
+            type_grid[i, j] = block.kind
+            free_blocks_counts[block_type] -= 1
+            placed += 1
+
+    result = backtrack(free_blocks_counts)
+    if result is None:
+        for _ in range(placed):
+            board.remove_last_free_block()
+    return result
+
+
+def _cell_assignments(positions, free_counts):
+    """
+    Enumerate every way of filling the given cells with the available blocks.
+
+    Args:
+        positions (list): Free cells (i, j) to fill.
+        free_counts (dict): Available count of each block type.
+
+    Yields:
+        list: ((i, j), block_type or None) pairs, one per cell in positions.
+    """
+    if not positions:
+        yield []
+        return
+    for block_type in ("C", "A", "B", None):
+        if block_type is not None and free_counts.get(block_type, 0) == 0:
+            continue
+        counts = dict(free_counts)
+        if block_type is not None:
+            counts[block_type] -= 1
+        for rest in _cell_assignments(positions[1:], counts):
+            yield [(positions[0], block_type)] + rest
+
+
+# Board searched by the current solve_parallel worker process.
+_worker_board = None
 
-        # Option 1: skip current position
-        result = backtrack(pos_index + 1, free_counts)
-        if result is not None:
-            return result
-
-        # Option 2: try placing each block type at current position
-        i, j = positions[pos_index]
-        if board.is_placeable(i, j):
-            for block_type in ["A", "B", "C"]:
-                if free_counts.get(block_type, 0) > 0:
-                    # Instantiate block of the given type
-                    if block_type == "A":
-                        block = ReflectBlock()
-                    elif block_type == "B":
-                        block = OpaqueBlock()
-                    elif block_type == "C":
-                        block = RefractBlock()
-
-                    board.place_free_block(i, j, block)
-                    free_counts[block_type] -= 1
-
-                    result = backtrack(pos_index + 1, free_counts)
-                    if result is not None:
-                        return result
-
-                    # Undo the move (backtrack)
-                    board.remove_free_block(i, j)
-                    free_counts[block_type] += 1
 
+def _init_worker(board):
+    """
+    Store the board each solve_parallel worker searches.
+
+    Args:
+        board (Board): The board to solve, unpickled once per worker.
+    """
+    global _worker_board
+    _worker_board = board
+
+
+def _solve_task(decisions):
+    """
+    Search the layouts matching some fixed cell contents, in a worker process.
+
+    Each task searches a clone of the worker's board, since a successful solve
+    leaves its blocks placed.
+
+    Args:
+        decisions (list): ((i, j), block_type or None) pairs, see solve.
+
+    Returns:
+        list of tuple or None: A valid solution or None.
+    """
+    return solve(_worker_board.clone(), decisions)
+
+
+def solve_parallel(board, processes=None, tasks_per_process=4):
+    """
+    Solve the board like solve, splitting the search over worker processes.
+
+    The first few cells of free_positions_ordered are filled in every possible
+    way; each filling is an independent task, and together they cover every
+    layout. The first solution any worker reports is applied to board, which
+    is left as solve would leave it.
+
+    Args:
+        board (Board): The initialized board containing grid, lasers, targets, and block constraints.
+        processes (int): Number of worker processes; defaults to the CPU count.
+        tasks_per_process (int): Minimum number of tasks to create per process.
+
+    Returns:
+        list of tuple or None: A solution as returned by solve, or None.
+    """
+    # Preflight once here rather than in every worker, before starting a pool.
+    if not targets_reachable(board):
         return None
 
-    return backtrack(0, free_blocks_counts.copy())
+    processes = processes or multiprocessing.cpu_count()
+    free_counts = {
+        block_type: board.blocks_available.get(block_type, 0)
+        for block_type in ("A", "B", "C")
+    }
+    positions = board.free_positions_ordered
+
+    # Fix more leading cells until there are enough tasks to share out.
+    tasks = [[]]
+    for depth in range(1, len(positions) + 1):
+        if len(tasks) >= processes * tasks_per_process:
+            break
+        tasks = list(_cell_assignments(positions[:depth], free_counts))
+
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(board,)) as pool:
+        # One task at a time, so a solution reaches us as soon as it is found.
+        for solution in pool.imap_unordered(_solve_task, tasks, chunksize=1):
+            if solution is not None:
+                pool.terminate()
+                break
+        else:
+            return None
+
+    names = {"ReflectBlock": "A", "OpaqueBlock": "B", "RefractBlock": "C"}
+    for (i, j), block_name in solution:
+        board.place_free_block(i, j, _new_block(names[block_name]))
+    return solution
+
+
+def simulate_cached(type_grid, lasers, targets, run=None):
+    """
+    Run the compiled beam simulation, reusing the result for a configuration
+    that has been simulated before.
+
+    The simulation is a pure function of its array inputs (refract state is
+    rebuilt on every call), so the raw bytes of the inputs identify its result.
+
+    Args:
+        type_grid (numpy.ndarray): int8 array (height, width) of block type codes.
+        lasers (numpy.ndarray): int64 array (n, 4) of (x, y, dx, dy) lazors.
+        targets (numpy.ndarray): int64 array (m, 2) of (x, y) target points.
+        run (callable): Computes the result on a cache miss instead of the
+            compiled simulation; used by test_solution's Python tracer.
+
+    Returns:
+        bool: True if all targets are hit, False otherwise.
+    """
+    key = (type_grid.shape, type_grid.tobytes(), lasers.tobytes(), targets.tobytes())
+    result = _sim_cache.get(key)
+    if result is not None:
+        _sim_cache.move_to_end(key)
+        return result
+
+    if run is None:
+        result = bool(simulate(type_grid, lasers, targets, MAX_STEPS))
+    else:
+        result = bool(run())
+    _sim_cache[key] = result
+    if len(_sim_cache) > SIM_CACHE_SIZE:
+        _sim_cache.popitem(last=False)
+    return result
 
 
 def test_solution(board, targets):
@@ -110,6 +400,11 @@ def test_solution(board, targets):
     Lazors are simulated step-by-step, interacting with placed blocks. If all targets are hit
     before the lazors exit or reach the step limit, the function returns True.
 
+    When Numba is installed and debug logging is off, the compiled simulation in
+    solver_numba is used; otherwise the beams are traced in Python. Unless debug
+    logging is on, results are remembered by simulate_cached, so a layout seen
+    before is not traced again.
+
     Args:
         board (Board): A Lazor game board.
         targets (set of tuple): Set of (x, y) coordinates that lazors must hit.
@@ -117,141 +412,158 @@ def test_solution(board, targets):
     Returns:
         bool: True if all targets are hit, False otherwise.
     """
-    board_copy = board.clone()
     visual_logger = logging.getLogger("visual")
-    visual_board = visualize_board(board_copy)
-    visual_logger.debug(
-        "Visual board at start of test_solution:\n%s", visual_board)
+    if visual_logger.isEnabledFor(logging.DEBUG):
+        visual_board = visualize_board(board)
+        visual_logger.debug(
+            "Visual board at start of test_solution:\n%s", visual_board)
 
-    remaining_targets = set(targets)
-    max_steps = 200  # Limit beam length to prevent infinite loops
+    # Debug runs always trace, so that every beam step is logged.
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        return _trace_beams(board, targets, debug=True)
+
+    return simulate_cached(
+        board.to_typegrid(),
+        np.array(board.lasers, dtype=np.int64).reshape(-1, 4),
+        np.array(sorted(targets), dtype=np.int64).reshape(-1, 2),
+        run=None if NUMBA_AVAILABLE else lambda: _trace_beams(board, targets),
+    )
+
+
+def _trace_beams(board, targets, debug=False):
+    """
+    Trace all lazors over the board in Python, step by step.
+
+    Args:
+        board (Board): A Lazor game board.
+        targets (set of tuple): Set of (x, y) coordinates that lazors must hit.
+        debug (bool): Log every beam step. Checked once by the caller, since
+            even disabled logging.debug calls cost a call per beam step.
+
+    Returns:
+        bool: True if all targets are hit, False otherwise.
+    """
 
-    blocks = board_copy.get_placed_blocks()
-    beam_queue = []
+    # Beam coordinates run from 0 to twice the board size; fixed per board.
+    size_x = board.orig_width * 2 + 1
+    size_y = board.orig_height * 2 + 1
+
+    # Targets still to hit, marked on a grid indexed [x][y] so the per-step
+    # check is two list lookups. Each cell counts once, however often it is
+    # listed, and a target off the board can never be hit.
+    target_grid = [[False] * size_y for _ in range(size_x)]
+    remaining = 0
+    for tx, ty in targets:
+        if not (0 <= tx < size_x and 0 <= ty < size_y):
+            return False
+        if not target_grid[tx][ty]:
+            target_grid[tx][ty] = True
+            remaining += 1
+    # Cells of refract blocks that have already split a beam.
+    refracted_cells = set()
+    # Beam states (x, y, dx, dy) already traced. A repeat of a state can only
+    # retrace the earlier beam's path (with no more steps left and no refract
+    # splits still to trigger), so it is dropped.
+    seen_states = set()
+
+    beam_queue = deque()
 
     # Initialize lazors
-    for lx, ly, vx, vy in board_copy.lasers:
+    for lx, ly, vx, vy in board.lasers:
+        # A lazor off the board traces nothing, as in the compiled tracer.
+        if not (0 <= lx < size_x and 0 <= ly < size_y):
+            continue
         beam_queue.append((lx, ly, vx, vy, 0))
-        logging.debug(
-            "Starting beam from (%d, %d) with direction (%d, %d)", lx, ly, vx, vy
-        )
+        if debug:
+            logging.debug(
+                "Starting beam from (%d, %d) with direction (%d, %d)", lx, ly, vx, vy
+            )
 
     while beam_queue:
-        x, y, dx, dy, steps = beam_queue.pop(0)
-
-        # Special handling for beams at their initial position.
-        if steps == 0:
-            epsilon = 0.1  # a small offset
-            # Check slightly ahead in the beam's direction
-            initial_check_x = x + epsilon * dx
-            initial_check_y = y + epsilon * dy
-
-            collided_block = None
-            for block in blocks:
-                if block.within_boundaries(initial_check_x, initial_check_y):
-                    collided_block = block
-                    logging.debug(
-                        "Initial beam collision at (%.1f, %.1f) with %s at original cell %s",
-                        initial_check_x,
-                        initial_check_y,
-                        type(block).__name__,
-                        block.orig_pos,
-                    )
-                    break
-            if collided_block is not None:
-                new_directions = collided_block.interact((dx, dy), (x, y))
-                if not new_directions:
-                    logging.debug(
-                        "Beam stopped immediately by block at initial position."
-                    )
-                    continue  # Beam stops immediately.
-                else:
-                    for new_dir in new_directions:
-                        new_dx, new_dy = new_dir
-                        logging.debug(
-                            "Initial beam collision produced new beam with direction (%d, %d)",
-                            new_dx,
-                            new_dy,
-                        )
-                        beam_queue.append(
-                            (
-                                x,
-                                y,
-                                new_dx,
-                                new_dy,
-                                steps + 1,
-                            )
-                        )
-                # Skip the normal move since we've handled the initial collision.
-                continue
-
-        logging.debug(
-            "Beam step %d: current position (%d, %d) with direction (%d, %d)",
-            steps,
-            x,
-            y,
-            dx,
-            dy,
-        )
-        if steps >= max_steps:
+        x, y, dx, dy, steps = beam_queue.popleft()
+
+        if debug:
+            logging.debug(
+                "Beam step %d: current position (%d, %d) with direction (%d, %d)",
+                steps,
+                x,
+                y,
+                dx,
+                dy,
+            )
+        if steps >= MAX_STEPS:
             continue
-
-        next_x = x + dx
-        next_y = y + dy
-        logging.debug("Beam step %d: moving to (%d, %d)",
-                      steps + 1, next_x, next_y)
-
-        if not (
-            0 <= next_x < board_copy.orig_width * 2 + 1
-            and 0 <= next_y < board_copy.orig_height * 2 + 1
-        ):
-            logging.debug("Beam left board from (%d, %d)", next_x, next_y)
+        state = (x, y, dx, dy)
+        if state in seen_states:
             continue
+        seen_states.add(state)
 
-        if (next_x, next_y) in remaining_targets:
-            logging.debug("Beam hit target at (%d, %d)", next_x, next_y)
-            remaining_targets.remove((next_x, next_y))
-            if not remaining_targets:
-                logging.debug("All targets hit.")
-                return True
-
-        collided_block = None
-        for block in blocks:
-            if block.within_boundaries(next_x, next_y):
-                collided_block = block
+        # Interact with the block in the cell the beam is about to enter.
+        cell = entered_cell(x, y, dx, dy)
+        collided_block = board.block_at_cell(*cell)
+        if collided_block is not None:
+            if debug:
                 logging.debug(
                     "Beam at (%d, %d) collided with %s at original cell %s (boundaries: top=%d, left=%d, bottom=%d, right=%d)",
-                    next_x,
-                    next_y,
-                    type(block).__name__,
-                    block.orig_pos,
-                    block.top,
-                    block.left,
-                    block.bottom,
-                    block.right,
+                    x,
+                    y,
+                    type(collided_block).__name__,
+                    collided_block.orig_pos,
+                    collided_block.top,
+                    collided_block.left,
+                    collided_block.bottom,
+                    collided_block.right,
                 )
-                break
-
-        if collided_block is not None:
-            new_directions = collided_block.interact(
-                (dx, dy), (next_x, next_y))
+            new_directions, refracted = INTERACTIONS[
+                (collided_block.kind, cell in refracted_cells, x % 2 == 0, dx, dy)
+            ]
+            if refracted:
+                refracted_cells.add(cell)
             if not new_directions:
-                logging.debug(
-                    "Beam stopped by block at (%d, %d)", next_x, next_y)
-            else:
-                for new_dir in new_directions:
-                    new_dx, new_dy = new_dir
+                if debug:
+                    logging.debug("Beam stopped by block at (%d, %d)", x, y)
+                continue
+
+            passes_through = False
+            for new_dx, new_dy in new_directions:
+                if (new_dx, new_dy) == (dx, dy):
+                    passes_through = True
+                    continue
+                if debug:
                     logging.debug(
                         "At (%d, %d), beam with direction (%d, %d) produced new beam with direction (%d, %d)",
-                        next_x,
-                        next_y,
+                        x,
+                        y,
                         dx,
                         dy,
                         new_dx,
                         new_dy,
                     )
-                    beam_queue.append(
-                        (next_x, next_y, new_dx, new_dy, steps + 1))
-        else:
-            beam_queue.append((next_x, next_y, dx, dy, steps + 1))
-    return len(remaining_targets) == 0
+                # A redirected beam may enter another block from this same point.
+                beam_queue.append((x, y, new_dx, new_dy, steps + 1))
+            if not passes_through:
+                continue
+
+        next_x = x + dx
+        next_y = y + dy
+        if debug:
+            logging.debug("Beam step %d: moving to (%d, %d)",
+                          steps + 1, next_x, next_y)
+
+        if not (0 <= next_x < size_x and 0 <= next_y < size_y):
+            if debug:
+                logging.debug("Beam left board from (%d, %d)", next_x, next_y)
+            continue
+
+        if target_grid[next_x][next_y]:
+            if debug:
+                logging.debug("Beam hit target at (%d, %d)", next_x, next_y)
+            target_grid[next_x][next_y] = False
+            remaining -= 1
+            if remaining == 0:
+                if debug:
+                    logging.debug("All targets hit.")
+                return True
+
+        beam_queue.append((next_x, next_y, dx, dy, steps + 1))
+    return remaining == 0
@@ -0,0 +1,226 @@
+"""
+solver_numba.py
+
+Compiled beam simulation for the Lazor solver.
+
+The board is lowered to an int8 grid of block type codes so the beam loop can
+run on plain integers. When Numba is installed the loop is JIT-compiled;
+otherwise `njit` is a no-op and NUMBA_AVAILABLE tells callers to keep using
+the pure-Python simulation in solver.py.
+"""
+
+import numpy as np
+from blocks import EMPTY, REFLECT, OPAQUE, REFRACT
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Outcomes of trace.
+MISSED = 0
+HIT = 1
+UNDECIDED = 2
+
+
+@njit(cache=True)
+def trace(type_grid, undecided, lasers, targets, max_steps):
+    """
+    Trace all lazors over a block type grid, stopping at undecided cells.
+
+    Mirrors solver._trace_beams: beams are processed first-in first-out, each
+    beam first interacts with the cell it is about to enter, and a refract
+    block only splits the first beam that reaches it.
+
+    Cells marked in undecided may still receive a block, so the trace gives up
+    as soon as a beam is about to enter one. Everything traced before that
+    happens the same way whatever is placed there later, so HIT and MISSED
+    hold for every way of filling the undecided cells.
+
+    Args:
+        type_grid (numpy.ndarray): int8 array (height, width) of block type codes.
+        undecided (numpy.ndarray): bool array (height, width) of cells whose
+            block is not decided yet.
+        lasers (numpy.ndarray): Integer array (n, 4) of (x, y, dx, dy) lazors.
+        targets (numpy.ndarray): Integer array (m, 2) of (x, y) target points.
+        max_steps (int): Maximum number of steps traced for any one beam.
+
+    Returns:
+        tuple: (outcome, i, j). The outcome is HIT if all targets are hit,
+        MISSED if they are not, or UNDECIDED if a beam reached an undecided
+        cell first; (i, j) is that cell, or (-1, -1) for the other outcomes.
+    """
+    height, width = type_grid.shape
+    size_x = 2 * width + 1
+    size_y = 2 * height + 1
+
+    target_grid = np.zeros((size_x, size_y), dtype=np.bool_)
+    remaining = 0
+    for k in range(targets.shape[0]):
+        tx = targets[k, 0]
+        ty = targets[k, 1]
+        if not (0 <= tx < size_x and 0 <= ty < size_y):
+            return MISSED, -1, -1  # A target off the board can never be hit.
+        if not target_grid[tx, ty]:
+            target_grid[tx, ty] = True
+            remaining += 1
+
+    # Each beam spawns at most one extra beam, and only at a refract block's
+    # first split, so this many slots always suffice for the ring buffer.
+    # Beam state is kept as one int32 array per field, preallocated once.
+    capacity = lasers.shape[0] + height * width + 1
+    beam_x = np.empty(capacity, dtype=np.int32)
+    beam_y = np.empty(capacity, dtype=np.int32)
+    beam_dx = np.empty(capacity, dtype=np.int32)
+    beam_dy = np.empty(capacity, dtype=np.int32)
+    beam_steps = np.empty(capacity, dtype=np.int32)
+    refracted = np.zeros((height, width), dtype=np.bool_)
+    # Beam states (x, y, dx + 1, dy + 1) already traced; see solver._trace_beams.
+    seen = np.zeros((size_x, size_y, 3, 3), dtype=np.bool_)
+    head = 0
+    count = 0
+    for k in range(lasers.shape[0]):
+        # A lazor off the board traces nothing. Later beams are bounds-checked
+        # before they are queued, so every queued state indexes seen safely.
+        if not (0 <= lasers[k, 0] < size_x and 0 <= lasers[k, 1] < size_y):
+            continue
+        beam_x[count] = lasers[k, 0]
+        beam_y[count] = lasers[k, 1]
+        beam_dx[count] = lasers[k, 2]
+        beam_dy[count] = lasers[k, 3]
+        beam_steps[count] = 0
+        count += 1
+
+    while count > 0:
+        x = beam_x[head]
+        y = beam_y[head]
+        dx = beam_dx[head]
+        dy = beam_dy[head]
+        steps = beam_steps[head]
+        head = (head + 1) % capacity
+        count -= 1
+
+        if steps >= max_steps:
+            continue
+        if seen[x, y, dx + 1, dy + 1]:
+            continue
+        seen[x, y, dx + 1, dy + 1] = True
+
+        # Cell the beam is about to enter (see board.entered_cell).
+        i = (y + dy) // 2 if y % 2 == 0 else y // 2
+        j = (x + dx) // 2 if x % 2 == 0 else x // 2
+        kind = EMPTY
+        if 0 <= i < height and 0 <= j < width:
+            if undecided[i, j]:
+                return UNDECIDED, i, j
+            kind = type_grid[i, j]
+
+        passes_through = True
+        if kind == OPAQUE:
+            continue
+        if kind == REFLECT or (kind == REFRACT and not refracted[i, j]):
+            if kind == REFRACT:
+                refracted[i, j] = True
+            else:
+                passes_through = False
+
+            # Reflect off the face the beam sits on (see Block.reflect_beam).
+            if x % 2 == 0:
+                new_dx, new_dy = -dx, dy
+            else:
+                new_dx, new_dy = dx, -dy
+
+            if new_dx == dx and new_dy == dy:
+                passes_through = True
+            else:
+                tail = (head + count) % capacity
+                beam_x[tail] = x
+                beam_y[tail] = y
+                beam_dx[tail] = new_dx
+                beam_dy[tail] = new_dy
+                beam_steps[tail] = steps + 1
+                count += 1
+        if not passes_through:
+            continue
+
+        next_x = x + dx
+        next_y = y + dy
+        if not (0 <= next_x < size_x and 0 <= next_y < size_y):
+            continue
+
+        if target_grid[next_x, next_y]:
+            target_grid[next_x, next_y] = False
+            remaining -= 1
+            if remaining == 0:
+                return HIT, -1, -1
+
+        tail = (head + count) % capacity
+        beam_x[tail] = next_x
+        beam_y[tail] = next_y
+        beam_dx[tail] = dx
+        beam_dy[tail] = dy
+        beam_steps[tail] = steps + 1
+        count += 1
+
+    return (HIT if remaining == 0 else MISSED), -1, -1
+
+
+@njit(cache=True)
+def simulate(type_grid, lasers, targets, max_steps):
+    """
+    Trace all lazors over a block type grid and report whether every target is hit.
+
+    Args:
+        type_grid (numpy.ndarray): int8 array (height, width) of block type codes.
+        lasers (numpy.ndarray): Integer array (n, 4) of (x, y, dx, dy) lazors.
+        targets (numpy.ndarray): Integer array (m, 2) of (x, y) target points.
+        max_steps (int): Maximum number of steps traced for any one beam.
+
+    Returns:
+        bool: True if all targets are hit, False otherwise.
+    """
+    undecided = np.zeros(type_grid.shape, dtype=np.bool_)
+    return trace(type_grid, undecided, lasers, targets, max_steps)[0] == HIT
+
+
+@njit(cache=True)
+def walk_to_block(type_grid, x, y, dx, dy):
+    """
+    Step a single beam in a straight line until it is about to enter a block.
+
+    The beam always takes at least one step. Only the geometry is handled
+    here; what the block does to the beam is left to the caller.
+
+    Args:
+        type_grid (numpy.ndarray): int8 array (height, width) of block type codes.
+        x, y (int): Starting coordinates of the beam.
+        dx, dy (int): Beam direction.
+
+    Returns:
+        tuple: (x, y, i, j) where the beam stopped. (i, j) is the cell of the
+        block it is about to enter, or (-1, -1) if it left the board instead.
+    """
+    height, width = type_grid.shape
+    size_x = 2 * width
+    size_y = 2 * height
+    # The first step is taken unconditionally, since a beam may start on the
+    # board's edge; after that the only way out of the loop is the bounds.
+    x += dx
+    y += dy
+    while 0 <= x <= size_x and 0 <= y <= size_y:
+        i = (y + dy) // 2 if y % 2 == 0 else y // 2
+        j = (x + dx) // 2 if x % 2 == 0 else x // 2
+        if 0 <= i < height and 0 <= j < width and type_grid[i, j] != EMPTY:
+            return x, y, i, j
+        x += dx
+        y += dy
+    return x, y, -1, -1
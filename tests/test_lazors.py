@@ -17,14 +17,15 @@ import glob
 import os
 import tempfile
 import shutil
-import matplotlib
+from unittest.mock import patch
+import numpy as np
 
-matplotlib.use("Agg")  # Use non-interactive backend for image generation
-
-from parser_bff import parse_bff_file
+from parser_bff import parse_bff_file, encode_grid, BLOCKED
 from board import Board
 import solver
-from blocks import ReflectBlock, OpaqueBlock, RefractBlock
+import solver_numba
+from blocks import ReflectBlock, OpaqueBlock, RefractBlock, INTERACTIONS
+from blocks import EMPTY, REFLECT, OPAQUE, REFRACT
 from visualization import visualize_board
 from visualization_image import save_laser_image
 
@@ -44,27 +45,76 @@ class TestBFFFiles(unittest.TestCase):
                 self.assertIn("lasers", data)
                 self.assertIn("points", data)
 
+    def test_grid_is_encoded(self):
+        data = parse_bff_file(os.path.join("data", "tiny_5.bff"))
+        self.assertEqual(data["grid"].dtype, np.int8)
+        self.assertEqual(data["grid"].shape, (3, 3))
+        self.assertEqual(data["grid"][0, 1], OPAQUE)
+        self.assertEqual(encode_grid([["x", "o", "A", "C"]]).tolist(), [[BLOCKED, EMPTY, REFLECT, REFRACT]])
+
+    def test_repeated_parse_returns_copies(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(temp_dir, "puzzle.bff")
+            with open(filename, "w") as f:
+                f.write("GRID START\no o\nGRID STOP\nA 1\nL 0 1 1 0\nP 2 1\n")
+            data = parse_bff_file(filename)
+            data["grid"][0, 0] = REFLECT
+            data["points"].append((4, 1))
+            self.assertEqual(parse_bff_file(filename)["grid"][0, 0], EMPTY)
+            self.assertEqual(parse_bff_file(filename)["points"], [(2, 1)])
+
+            # An edited file is parsed again.
+            with open(filename, "w") as f:
+                f.write("GRID START\no x\nGRID STOP\nA 1\nL 0 1 1 0\nP 2 1\n")
+            os.utime(filename, (0, os.path.getmtime(filename) + 1))
+            self.assertEqual(parse_bff_file(filename)["grid"][0, 1], BLOCKED)
+        finally:
+            shutil.rmtree(temp_dir)
+
 
 class TestBoard(unittest.TestCase):
     """Test Board initialization, block placement, and free position logic."""
 
-    def setUp(self):
-        self.data = {
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
             "grid": [["o", "o"], ["x", "o"]],
             "blocks_available": {"A": 1, "B": 0, "C": 0},
             "lasers": [(0, 0, 1, 0)],
             "points": [(1, 0)],
         }
+
+    def setUp(self):
+        # Tests place and remove blocks, so each one gets a fresh board.
         self.board = Board(self.data)
 
     def test_free_positions(self):
         expected_free_positions = {(0, 0), (0, 1), (1, 1)}
         self.assertEqual(set(self.board.free_positions), expected_free_positions)
 
+    def test_free_positions_ordered(self):
+        ordered = self.board.free_positions_ordered
+        self.assertEqual(sorted(ordered), sorted(self.board.free_positions))
+        # The lazor (0, 0) -> (1, 0) only crosses cell (0, 0).
+        self.assertEqual(ordered[0], (0, 0))
+
     def test_is_placeable(self):
         self.assertTrue(self.board.is_placeable(0, 0))
         self.assertFalse(self.board.is_placeable(1, 0))  # cell marked 'x'
 
+    def test_character_array_grid(self):
+        for dtype in ("<U1", "S1"):
+            with self.subTest(dtype=dtype):
+                grid = np.array(self.data["grid"], dtype=dtype)
+                board = Board(dict(self.data, grid=grid))
+                self.assertEqual(board.orig_grid.tolist(), Board(self.data).orig_grid.tolist())
+
+    def test_fixed_block_cell_is_not_placeable(self):
+        board = Board(dict(self.data, grid=[["A", "o"], ["x", "o"]]))
+        self.assertFalse(board.is_placeable(0, 0))
+        self.assertTrue(board.is_placeable(0, 1))
+
     def test_place_and_remove_free_block(self):
         block = ReflectBlock()
         self.board.place_free_block(0, 0, block)
@@ -75,26 +125,68 @@ class TestBoard(unittest.TestCase):
         self.assertTrue(self.board.is_placeable(0, 0))
         self.assertEqual(len(self.board.free_blocks_placed), 0)
 
+    def test_block_at_cell(self):
+        block = ReflectBlock()
+        self.board.place_free_block(0, 1, block)
+        self.assertIs(self.board.block_at_cell(0, 1), block)
+        self.board.remove_free_block(0, 1)
+        self.assertIsNone(self.board.block_at_cell(0, 1))
+
+    def test_placed_blocks_follow_placements(self):
+        block = ReflectBlock()
+        self.assertEqual(self.board.get_placed_blocks(), [])
+        self.board.place_free_block(0, 1, block)
+        self.assertEqual(self.board.get_placed_blocks(), [block])
+        self.board.remove_last_free_block()
+        self.assertEqual(self.board.get_placed_blocks(), [])
+
+    def test_remove_last_free_block(self):
+        self.board.place_free_block(0, 0, ReflectBlock())
+        self.board.place_free_block(1, 1, OpaqueBlock())
+        self.board.remove_last_free_block()
+        self.assertFalse(self.board.is_placeable(0, 0))
+        self.assertTrue(self.board.is_placeable(1, 1))
+
+    def test_restore_block_state(self):
+        refract = RefractBlock()
+        self.board.place_free_block(0, 0, refract)
+        snapshot = self.board.snapshot_block_state()
+        refract.interact((1, 1), (0, 1))
+        self.assertTrue(refract.has_refracted)
+        self.board.restore_block_state(snapshot)
+        self.assertFalse(refract.has_refracted)
+
+    def test_clone_is_independent(self):
+        self.board.place_free_block(0, 0, ReflectBlock())
+        board_copy = self.board.clone()
+        self.assertIsNot(board_copy.free_blocks_placed[0], self.board.free_blocks_placed[0])
+        self.assertEqual(board_copy.free_blocks_placed[0].orig_pos, (0, 0))
+
+        board_copy.remove_free_block(0, 0)
+        self.assertEqual(len(self.board.free_blocks_placed), 1)
+
 
 class TestBlocks(unittest.TestCase):
     """Test behavior of different block types."""
 
-    def setUp(self):
-        self.reflect_block = ReflectBlock()
-        self.reflect_block.set_boundaries(2, 2, 4, 4)
+    @classmethod
+    def setUpClass(cls):
+        # Reflect blocks keep no state between interactions, so one is shared.
+        cls.reflect_block = ReflectBlock()
+        cls.reflect_block.set_boundaries(2, 2, 4, 4)
 
     def test_reflect_beam_left(self):
-        new_dir = self.reflect_block.reflect_beam((2.1, 3), (1, 0))
+        new_dir = self.reflect_block.reflect_beam((2, 3), (1, 0))
         self.assertEqual(new_dir, (-1, 0))
 
     def test_reflect_beam_top(self):
-        new_dir = self.reflect_block.reflect_beam((3, 2.1), (0, 1))
+        new_dir = self.reflect_block.reflect_beam((3, 2), (0, 1))
         self.assertEqual(new_dir, (0, -1))
 
     def test_opaque_block_interaction(self):
         opaque = OpaqueBlock()
         result = opaque.interact((1, 1), (3, 3))
-        self.assertEqual(result, [])
+        self.assertEqual(result, ())
 
     def test_refract_block_interaction_first(self):
         refract = RefractBlock()
@@ -109,17 +201,31 @@ class TestBlocks(unittest.TestCase):
         result = refract.interact((1, 1), (3, 3))
         self.assertEqual(len(result), 1)
 
+    def test_interactions_match_interact(self):
+        for block in (ReflectBlock(), OpaqueBlock(), RefractBlock()):
+            with self.subTest(block=type(block).__name__):
+                block.set_boundaries(2, 2, 4, 4)
+                for position in ((2, 3), (3, 2)):
+                    has_refracted = getattr(block, "has_refracted", False)
+                    vertical_face = position[0] % 2 == 0
+                    key = (block.kind, has_refracted, vertical_face, 1, 1)
+                    new_dirs, _ = INTERACTIONS[key]
+                    self.assertEqual(new_dirs, block.interact((1, 1), position))
+
 
 class TestSolver(unittest.TestCase):
     """Test that the solver finds valid solutions."""
 
-    def setUp(self):
-        self.data = {
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
             "grid": [["o", "o"], ["o", "o"]],
             "blocks_available": {"A": 1, "B": 0, "C": 0},
             "lasers": [(0, 1, 1, 0)],
             "points": [(2, 1)],
         }
+
+    def setUp(self):
         self.board = Board(self.data)
 
     def test_solver_finds_solution(self):
@@ -127,17 +233,165 @@ class TestSolver(unittest.TestCase):
         self.assertIsNotNone(solution)
         self.assertTrue(solver.test_solution(self.board, set(self.data["points"])))
 
+    def test_solver_never_revisits_a_layout(self):
+        board = Board(parse_bff_file(os.path.join("data", "mad_1.bff")))
+        layouts = []
+
+        def record(*args):
+            layouts.append(board.to_typegrid().tobytes())
+            return False
+
+        # Reject every layout so the whole search tree is walked.
+        with patch.object(solver, "simulate", record), patch.object(
+            solver, "_trace_beams", record
+        ), patch.object(solver, "test_solution", record):
+            self.assertIsNone(solver.solve(board))
+        self.assertGreater(len(layouts), 1)
+        self.assertEqual(len(layouts), len(set(layouts)))
+
+    def test_solver_without_numba_skips_cache(self):
+        solver._sim_cache.clear()
+        with patch.object(solver, "NUMBA_AVAILABLE", False):
+            self.assertIsNotNone(solver.solve(self.board))
+        self.assertEqual(len(solver._sim_cache), 0)
+
+    def test_unreachable_target_fails_preflight(self):
+        self.assertTrue(solver.targets_reachable(self.board))
+        # Lazors only travel along one row here, so (3, 4) can never be hit.
+        board = Board(dict(self.data, points=[(3, 4)]))
+        self.assertFalse(solver.targets_reachable(board))
+        self.assertIsNone(solver.solve(board))
+        with patch.object(solver.multiprocessing, "Pool") as pool:
+            self.assertIsNone(solver.solve_parallel(board, processes=2))
+        pool.assert_not_called()
+
+    def test_solve_parallel_finds_solution(self):
+        solution = solver.solve_parallel(self.board, processes=2)
+        self.assertIsNotNone(solution)
+        self.assertEqual(len(self.board.free_blocks_placed), 1)
+        self.assertTrue(solver.test_solution(self.board, set(self.data["points"])))
+
+    def test_solve_task_leaves_worker_board_unchanged(self):
+        solver._init_worker(self.board)
+        try:
+            self.assertIsNotNone(solver._solve_task([]))
+            # The next task in the same worker must start from an empty board.
+            self.assertEqual(self.board.free_blocks_placed, [])
+        finally:
+            solver._init_worker(None)
+
+    def test_off_board_laser_traces_nothing(self):
+        board = Board(dict(self.data, lasers=[(5, 1, -1, 0), (0, 9, 1, -1)]))
+        lasers = np.array(board.lasers).reshape(-1, 4)
+        targets = np.array(self.data["points"]).reshape(-1, 2)
+        self.assertFalse(solver._trace_beams(board, board.points))
+        self.assertFalse(
+            solver_numba.simulate(board.to_typegrid(), lasers, targets, solver.MAX_STEPS)
+        )
+
+    def test_typegrid_simulation_matches_python(self):
+        board = Board(parse_bff_file(os.path.join("data", "tiny_5.bff")))
+        board.place_free_block(0, 0, ReflectBlock())
+        board.place_free_block(2, 1, RefractBlock())
+        lasers = np.array(board.lasers).reshape(-1, 4)
+        for points in ([(1, 2)], [(6, 3)], [(1, 2), (6, 3)], [(3, 0)]):
+            with self.subTest(points=points):
+                targets = np.array(points).reshape(-1, 2)
+                expected = solver._trace_beams(board, set(points))
+                result = solver_numba.simulate(
+                    board.to_typegrid(), lasers, targets, solver.MAX_STEPS
+                )
+                self.assertEqual(result, expected)
+
+    def test_simulate_cached_reuses_result(self):
+        type_grid = self.board.to_typegrid()
+        lasers = np.array(self.board.lasers).reshape(-1, 4)
+        targets = np.array(sorted(self.board.points)).reshape(-1, 2)
+        solver._sim_cache.clear()
+        expected = solver.simulate_cached(type_grid, lasers, targets)
+        with patch.object(solver, "simulate") as simulate:
+            self.assertEqual(solver.simulate_cached(type_grid, lasers, targets), expected)
+        simulate.assert_not_called()
+
+    def test_duplicate_target_counts_once(self):
+        targets = [(2, 1), (2, 1)]
+        self.assertTrue(solver._trace_beams(self.board, targets))
+        self.assertTrue(
+            solver_numba.simulate(
+                self.board.to_typegrid(),
+                np.array(self.board.lasers).reshape(-1, 4),
+                np.array(targets),
+                solver.MAX_STEPS,
+            )
+        )
+
+    def test_python_trace_is_cached(self):
+        solver._sim_cache.clear()
+        with patch.object(solver, "NUMBA_AVAILABLE", False):
+            expected = solver.test_solution(self.board, self.board.points)
+            with patch.object(solver, "_trace_beams") as trace_beams:
+                result = solver.test_solution(self.board, self.board.points)
+        self.assertEqual(result, expected)
+        trace_beams.assert_not_called()
+
+    def test_trace_stops_at_undecided_cells(self):
+        type_grid = self.board.to_typegrid()
+        lasers = np.array(self.board.lasers).reshape(-1, 4)
+        targets = np.array([(1, 2)])
+        undecided = np.zeros(type_grid.shape, dtype=np.bool_)
+        # With no blocks the lazor misses (1, 2) for certain...
+        self.assertEqual(
+            solver_numba.trace(type_grid, undecided, lasers, targets, solver.MAX_STEPS),
+            (solver_numba.MISSED, -1, -1),
+        )
+        # ...but a block could still be placed in the first cell it crosses.
+        undecided[0, 0] = True
+        self.assertEqual(
+            solver_numba.trace(type_grid, undecided, lasers, targets, solver.MAX_STEPS),
+            (solver_numba.UNDECIDED, 0, 0),
+        )
+
+    def test_beam_leaving_refract_block_hits_neighbour(self):
+        board = Board(
+            {
+                "grid": [["o", "o"], ["o", "o"]],
+                "blocks_available": {"A": 0, "B": 0, "C": 0},
+                "lasers": [(1, 0, 1, 1)],
+                "points": [(4, 1)],
+            }
+        )
+        board.place_free_block(0, 0, RefractBlock())
+        board.place_free_block(0, 1, ReflectBlock())
+        # The beam passing through the refract block must reflect off the
+        # neighbouring block instead of crossing it to reach (4, 1).
+        self.assertFalse(solver.test_solution(board, set(board.points)))
+
+    def test_walk_to_block(self):
+        type_grid = np.zeros((2, 2), dtype=np.int8)
+        # With no blocks the beam walks straight off the board...
+        self.assertEqual(
+            solver_numba.walk_to_block(type_grid, 1, 0, 1, 1), (5, 4, -1, -1)
+        )
+        # ...and otherwise stops where it is about to enter the block.
+        type_grid[1, 1] = REFLECT
+        self.assertEqual(
+            solver_numba.walk_to_block(type_grid, 1, 0, 1, 1), (3, 2, 1, 1)
+        )
+
 
 class TestVisualizationImage(unittest.TestCase):
     """Test that the visualization image gets correctly saved to disk."""
 
-    def setUp(self):
-        self.data = {
+    @classmethod
+    def setUpClass(cls):
+        cls.data = {
             "grid": [["o", "o"], ["o", "o"]],
             "blocks_available": {"A": 1, "B": 0, "C": 0},
             "lasers": [(0, 1, 1, 0)],
             "points": [(2, 1)],
         }
+
+    def setUp(self):
         self.board = Board(self.data)
         self.board.place_free_block(0, 0, ReflectBlock())
 
@@ -149,8 +403,29 @@ class TestVisualizationImage(unittest.TestCase):
                 (block.orig_pos, type(block).__name__)
                 for block in self.board.free_blocks_placed
             ]
+            grid = self.board.orig_grid.copy()
             save_laser_image(self.board, solution=solution, filename=filename)
             self.assertTrue(os.path.exists(filename))
+            # The solution is drawn without writing it into the board's grid.
+            np.testing.assert_array_equal(self.board.orig_grid, grid)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_trapped_beam_image_finishes(self):
+        # The lazor bounces around the centre cell forever.
+        board = Board(
+            {
+                "grid": [["A", "A", "A"], ["A", "o", "A"], ["A", "A", "A"]],
+                "blocks_available": {"A": 0, "B": 0, "C": 0},
+                "lasers": [(3, 2, 1, 1)],
+                "points": [(3, 4)],
+            }
+        )
+        temp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(temp_dir, "trapped.png")
+            save_laser_image(board, solution=[], filename=filename)
+            self.assertTrue(os.path.exists(filename))
         finally:
             shutil.rmtree(temp_dir)
 
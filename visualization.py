@@ -1,4 +1,8 @@
-from blocks import ReflectBlock, OpaqueBlock, RefractBlock
+import numpy as np
+from parser_bff import BLOCKED
+
+# Display character for each block kind code (see blocks.EMPTY/REFLECT/OPAQUE/REFRACT).
+KIND_CHARS = np.array(["o", "A", "B", "C"])
 
 
 def visualize_board(board):
@@ -17,39 +21,6 @@ def visualize_board(board):
     Returns:
         str: A multi-line string representing the board layout.
     """
-    lines = []
-    for i in range(board.orig_height):
-        row = []
-        for j in range(board.orig_width):
-            if board.orig_grid[i][j] == "x":
-                row.append("x")
-            else:
-                found = None
-
-                # First check if a free block is placed at this position
-                for block in board.free_blocks_placed:
-                    if block.orig_pos == (i, j):
-                        found = block
-                        break
-
-                # Then check if a fixed block exists at this position
-                if not found:
-                    for block in board.fixed_blocks:
-                        if block.orig_pos == (i, j):
-                            found = block
-                            break
-
-                # Determine the character to display
-                if found:
-                    if isinstance(found, ReflectBlock):
-                        row.append("A")
-                    elif isinstance(found, OpaqueBlock):
-                        row.append("B")
-                    elif isinstance(found, RefractBlock):
-                        row.append("C")
-                    else:
-                        row.append("?")  # Unknown block type
-                else:
-                    row.append("o")  # Empty placeable cell
-        lines.append("   ".join(row))
-    return "\n".join(lines)
+    chars = KIND_CHARS[board.to_typegrid()]
+    chars[board.orig_grid == BLOCKED] = "x"
+    return "\n".join("   ".join(row) for row in chars.tolist())
@@ -1,60 +1,75 @@
-from blocks import ReflectBlock, OpaqueBlock, RefractBlock
+from collections import deque
+import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")  # Images are only written to files, never shown.
+
 import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.patches import Circle, Rectangle
+from blocks import EMPTY, REFLECT, OPAQUE, REFRACT
+from board import entered_cell
+from parser_bff import BLOCKED
+from solver_numba import walk_to_block
+
+# Length of the arrow head drawn at the end of each beam segment, in grid units.
+ARROW_HEAD_LENGTH = 0.2
+
+# Largest drawing area (width, height) in inches, and the blank margin around
+# it. Images are sized to fit the board exactly, so no tight-bbox pass is needed.
+MAX_DRAWING_SIZE = (6.4, 4.8)
+IMAGE_MARGIN = 0.1
+
+# Grid code of each block class name used in solutions.
+BLOCK_CODES = {"ReflectBlock": REFLECT, "OpaqueBlock": OPAQUE, "RefractBlock": REFRACT}
+
+# Fill colour of each non-empty grid code.
+CELL_COLORS = {BLOCKED: "slategrey", REFLECT: "green", OPAQUE: "black", REFRACT: "blue"}
+
+# Figure and axes reused by every save_laser_image call (see _clear_axes).
+_figure = None
+_axes = None
+
+
+def _clear_axes():
+    """
+    Return the shared figure and axes, cleared for a new drawing.
+
+    The figure is created on first use and then kept, so repeated calls do not
+    pay for setting up and tearing down a figure each time.
+
+    Returns:
+        tuple: (figure, axes)
+    """
+    global _figure, _axes
+    if _figure is None:
+        _figure, _axes = plt.subplots()
+    else:
+        _axes.cla()
+    return _figure, _axes
 
 
-def find_lazor_endpoint(lazor_grid, x, y, vx, vy, grid_size_x, grid_size_y):
+def find_lazor_endpoint(lazor_grid, type_grid, x, y, vx, vy):
     """
     Trace a lazor's path until it exits the grid or interacts with a block.
 
     Args:
         lazor_grid (Board): The current board configuration.
+        type_grid (np.ndarray): The board's block-type grid, from to_typegrid().
         x, y (int): Starting coordinates of the lazor.
         vx, vy (int): Lazor direction vector.
-        grid_size_x (int): Width of the lazor grid.
-        grid_size_y (int): Height of the lazor grid.
 
     Returns:
-        tuple: (end_x, end_y, [list of new direction vectors])
+        tuple: (end_x, end_y, tuple of new (dx, dy) directions)
     """
-    is_first_turn = True
-    new_directions = []  # Default: no new directions
-
-    while (0 <= x <= grid_size_y and 0 <= y <= grid_size_x) or is_first_turn:
-        x += vx
-        y += vy
-        found_collision = False
-
-        blocks = lazor_grid.get_placed_blocks()
-        for block in blocks:
-            if block.within_boundaries(x, y):
-                # Get new beam directions from block's interaction.
-                new_directions = block.interact((vx, vy), (x, y))
-                if new_directions:
-                    # Ensure we have a list of direction vectors.
-                    if isinstance(new_directions[0], (list, tuple)):
-                        new_directions = [
-                            list(direction) for direction in new_directions
-                        ]
-                    else:
-                        new_directions = [list(new_directions)]
-                found_collision = True
-                break  # Stop at the first collision
-
-        if found_collision:
-            # Only return new directions if still within bounds
-            if 0 <= x <= grid_size_y and 0 <= y <= grid_size_x:
-                return x, y, new_directions
-            else:
-                # Beam already out-of-bound; do not propagate further.
-                return x, y, []
-
-        if is_first_turn:
-            is_first_turn = False
-
-    # If while loop ended (i.e., beam went out-of-bound with no collision),
-    # return no new directions.
-    return x, y, []
+    end_x, end_y, i, j = walk_to_block(type_grid, x, y, vx, vy)
+    if i < 0:
+        # The beam went out-of-bound with no collision.
+        return end_x, end_y, ()
+
+    # Get new beam directions from the interaction with the block it reached.
+    block = lazor_grid.block_at_cell(i, j)
+    return end_x, end_y, block.interact((vx, vy), (end_x, end_y))
 
 
 def save_laser_image(lazor_grid, solution=None, filename=None):
@@ -64,127 +79,163 @@ def save_laser_image(lazor_grid, solution=None, filename=None):
     Args:
         lazor_grid (Board): Board instance with grid, lasers, and blocks.
         solution (list): Optional list of tuples (position, block_type_name) representing placed blocks.
-        filename (str): Output file path for saving the image.
+        filename (str): Output file path for saving the image. Nothing is
+            drawn if it is None or the board has no cells.
     """
-    grid = lazor_grid.orig_grid
-    x_size_grid = len(grid) * 2
-    y_size_grid = len(grid[0]) * 2
+    grid = lazor_grid.orig_grid  # Read only.
+    if filename is None or grid.size == 0:
+        return
 
-    fig, ax = plt.subplots()
+    x_size_grid = grid.shape[0] * 2
+    y_size_grid = grid.shape[1] * 2
+
+    fig, ax = _clear_axes()
     ax.set_xlim(-1, y_size_grid + 1)
     ax.set_ylim(-1, x_size_grid + 1)
-
-    # Add black border around the grid
-    ax.add_patch(Rectangle((-1, -1), 1, x_size_grid + 3, color="slategrey"))
-    ax.add_patch(Rectangle((y_size_grid, -1), 1, x_size_grid + 3, color="slategrey"))
-    ax.add_patch(Rectangle((-1, -1), y_size_grid + 3, 1, color="slategrey"))
-    ax.add_patch(Rectangle((-1, x_size_grid), y_size_grid + 3, 1, color="slategrey"))
-
-    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-
-    # Map block class names to display characters if applying a solution.
-    block_type_dict = {"ReflectBlock": "A", "OpaqueBlock": "B", "RefractBlock": "C"}
-
+    ax.set_autoscale_on(False)
+
+    # Size the figure so the axes cover exactly the plotted area at equal
+    # scale on both axes, plus a blank margin.
+    scale = min(
+        MAX_DRAWING_SIZE[0] / (y_size_grid + 2), MAX_DRAWING_SIZE[1] / (x_size_grid + 2)
+    )
+    fig_width = (y_size_grid + 2) * scale + 2 * IMAGE_MARGIN
+    fig_height = (x_size_grid + 2) * scale + 2 * IMAGE_MARGIN
+    fig.set_size_inches(fig_width, fig_height)
+    ax.set_position(
+        [
+            IMAGE_MARGIN / fig_width,
+            IMAGE_MARGIN / fig_height,
+            1 - 2 * IMAGE_MARGIN / fig_width,
+            1 - 2 * IMAGE_MARGIN / fig_height,
+        ]
+    )
+
+    # Add border around the grid
+    border = [
+        Rectangle((-1, -1), 1, x_size_grid + 3),
+        Rectangle((y_size_grid, -1), 1, x_size_grid + 3),
+        Rectangle((-1, -1), y_size_grid + 3, 1),
+        Rectangle((-1, x_size_grid), y_size_grid + 3, 1),
+    ]
+    ax.add_collection(PatchCollection(border, color="slategrey"))
+
+    # Map block class names to grid codes if applying a solution. The placed
+    # blocks are kept in a display-only overlay so the board is not modified.
+    cell_codes = {(x, y): int(grid[x, y]) for x, y in np.argwhere(grid != EMPTY).tolist()}
     if solution is not None:
         for (x, y), block_type in solution:
-            grid[x][y] = block_type_dict.get(block_type, "?")
+            cell_codes[(x, y)] = BLOCK_CODES.get(block_type, EMPTY)
 
-    # Draw the grid: fill squares (if they are not marked as 'o')
+    # Draw the grid: fill squares (if they are not empty), all in one collection.
     square_size = 2
-    for x, row in enumerate(grid):
-        for y, col in enumerate(row):
-            if col == "o":
-                continue
-            x_pos = x * 2 + 1
-            y_pos = y * 2 + 1
-            color = {"x": "slategrey", "A": "green", "B": "black", "C": "blue"}.get(
-                col, "white"
-            )  # Default to white if unknown
-            square = plt.Rectangle(
-                (y_pos - square_size / 2, x_pos - square_size / 2),
-                square_size,
-                square_size,
-                color=color,
-            )
-            ax.add_patch(square)
+    squares = []
+    square_colors = []
+    for (x, y), code in cell_codes.items():
+        if code == EMPTY:
+            continue
+        squares.append(
+            Rectangle((y * square_size, x * square_size), square_size, square_size)
+        )
+        # Default to white if unknown.
+        square_colors.append(CELL_COLORS.get(code, "white"))
+    ax.add_collection(
+        PatchCollection(squares, facecolors=square_colors, edgecolors=square_colors)
+    )
 
     # Draw grid lines
-    for i in range(0, x_size_grid + 1, 2):
-        ax.plot([0, y_size_grid], [i, i], color="black", linewidth=1)
-    for i in range(0, y_size_grid + 1, 2):
-        ax.plot([i, i], [0, x_size_grid], color="black", linewidth=1)
+    ax.hlines(
+        np.arange(0, x_size_grid + 1, 2), 0, y_size_grid, colors="black", linewidths=1
+    )
+    ax.vlines(
+        np.arange(0, y_size_grid + 1, 2), 0, x_size_grid, colors="black", linewidths=1
+    )
+
+    # Draw target points, also as one collection.
+    ax.add_collection(
+        PatchCollection(
+            [Circle((px, py), 0.2) for px, py in lazor_grid.points], color="black"
+        )
+    )
 
-    # Draw target points
-    for px, py in lazor_grid.points:
-        circle = plt.Circle((px, py), 0.2, color="black")
-        ax.add_patch(circle)
+    # Start from fresh block state in case the board was simulated before,
+    # and put the caller's state back once the beams are drawn.
+    block_state = lazor_grid.snapshot_block_state()
+    lazor_grid.reset_blocks()
 
-    # Initialize beams with a step counter.
+    # Initialize beams with a step counter, traced first-in first-out like
+    # the solver does, so refract blocks split the same beam they do there.
     # Each beam is a tuple: (x, y, vx, vy, steps)
-    lazors = [(lx, ly, vx, vy, 0) for lx, ly, vx, vy in lazor_grid.lasers.copy()]
+    lazors = deque((lx, ly, vx, vy, 0) for lx, ly, vx, vy in lazor_grid.lasers)
+    segments = []
+    heads = []
+    # Beam states (x, y, vx, vy) already traced from. A repeat would only
+    # redraw the segment traced the first time, so it is dropped.
+    traced = set()
+    # Blocks stay put while beams are drawn, so one type grid serves every walk.
+    type_grid = lazor_grid.to_typegrid()
 
     while lazors:
-        x, y, vx, vy, steps = lazors.pop()
+        x, y, vx, vy, steps = lazors.popleft()
 
         # --- Special handling for beams at their initial position ---
         if steps == 0:
-            epsilon = (
-                0.1  # small offset to check immediately ahead of the starting position
-            )
-            init_x = x + epsilon * vx
-            init_y = y + epsilon * vy
-
-            collided_block = None
-            blocks = lazor_grid.get_placed_blocks()
-            for block in blocks:
-                if block.within_boundaries(init_x, init_y):
-                    collided_block = block
-                    break
+            # Check the cell immediately ahead of the starting position.
+            collided_block = lazor_grid.block_at_cell(*entered_cell(x, y, vx, vy))
             if collided_block is not None:
                 new_directions = collided_block.interact((vx, vy), (x, y))
                 # If the block redirects the beam, queue up the new beams.
-                if new_directions:
-                    if isinstance(new_directions[0], (list, tuple)):
-                        new_dirs_list = [
-                            list(direction) for direction in new_directions
-                        ]
-                    else:
-                        new_dirs_list = [list(new_directions)]
-                    for new_dir in new_dirs_list:
-                        lazors.append((x, y, new_dir[0], new_dir[1], steps + 1))
+                for new_vx, new_vy in new_directions:
+                    lazors.append((x, y, new_vx, new_vy, steps + 1))
                 # Skip normal propagation for this beam.
                 continue
         # --- End of special handling ---
 
+        if (x, y, vx, vy) in traced:
+            continue
+        traced.add((x, y, vx, vy))
+
         # Propagate the beam normally using find_lazor_endpoint.
         end_x, end_y, new_dirs = find_lazor_endpoint(
-            lazor_grid, x, y, vx, vy, x_size_grid, y_size_grid
+            lazor_grid, type_grid, x, y, vx, vy
         )
 
-        # Draw the beam segment from (x, y) to (end_x, end_y)
-        ax.arrow(
-            x,
-            y,
-            end_x - x,
-            end_y - y,
-            head_width=0.2,
-            head_length=0.2,
-            fc="red",
-            ec="red",
-        )
+        # Collect the beam segment from (x, y) to (end_x, end_y); all segments
+        # are drawn together once the beams are traced.
+        segments.append(((x, y), (end_x, end_y)))
+        heads.append((end_x, end_y, vx, vy))
 
         # If the beam remains within bounds and produces new directions, queue them.
         if 0 <= end_x <= y_size_grid and 0 <= end_y <= x_size_grid:
-            if new_dirs:
-                if isinstance(new_dirs[0], (list, tuple)):
-                    new_dirs_list = [list(direction) for direction in new_dirs]
-                else:
-                    new_dirs_list = [list(new_dirs)]
-                for new_dir in new_dirs_list:
-                    lazors.append((end_x, end_y, new_dir[0], new_dir[1], steps + 1))
+            for new_vx, new_vy in new_dirs:
+                lazors.append((end_x, end_y, new_vx, new_vy, steps + 1))
+
+    lazor_grid.restore_block_state(block_state)
+
+    # Draw every beam segment in one collection, with one short arrow head
+    # per segment pointing on from its end.
+    ax.add_collection(LineCollection(segments, colors="red", linewidths=1))
+    if heads:
+        head_x, head_y, head_dx, head_dy = np.array(heads, dtype=float).T
+        head_scale = ARROW_HEAD_LENGTH / np.hypot(head_dx, head_dy)
+        ax.quiver(
+            head_x,
+            head_y,
+            head_dx * head_scale,
+            head_dy * head_scale,
+            color="red",
+            angles="xy",
+            scale_units="xy",
+            scale=1,
+            units="xy",
+            width=0.02,
+            headwidth=10,
+            headlength=10,
+            headaxislength=10,
+            minlength=0,
+        )
 
     ax.axis("off")
     ax.set_aspect("equal")
-    plt.gca().invert_yaxis()
-    plt.savefig(filename, bbox_inches="tight")
-    plt.close()
+    ax.invert_yaxis()
+    fig.savefig(filename)